@@ -1,12 +1,34 @@
 import logging
+import os
 import time
+import diskcache
 import plotly.graph_objects as go
 
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, DiskcacheManager
+from dash.exceptions import PreventUpdate
 from lib import simulate_fixed_intervals
+from lib.vaporization_grid import (
+    CALIBRATED_K,
+    RELATIVE_HUMIDITY_RANGE,
+    TEMPERATURE_RANGE,
+    grid_window,
+    isohume_lines,
+)
+
+# seconds to wait after the last keystroke before an input change is sent
+INPUT_DEBOUNCE_SECONDS = 0.5
+# milliseconds between polls for the result of a background simulation
+BACKGROUND_POLL_INTERVAL_MS = 150
+
+# simulations run as background jobs. A newer trigger from the same browser
+# session terminates the job still in flight, so only the latest input wins.
+# https://dash.plotly.com/background-callbacks
+# the job store has its own directory next to the grids of lib.vaporization_grid
+cache = diskcache.Cache(os.path.join("cache", "jobs"))
+background_callback_manager = DiskcacheManager(cache)
 
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, background_callback_manager=background_callback_manager)
 app.title = "Humidity Simulator"
 server = app.server
 if __name__ != '__main__':
@@ -22,25 +44,77 @@ app.layout = html.Div(
         html.Div(
             [
                 html.Label("Room Volume (m³):"),
-                dcc.Input(id="room_volume", type="number", value=220, step=1),
+                dcc.Input(
+                    id="room_volume",
+                    type="number",
+                    value=220,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Air Exchange Rate (%):"),
-                dcc.Input(id="air_exchange_rate", type="number", value=70, step=10),
+                dcc.Input(
+                    id="air_exchange_rate",
+                    type="number",
+                    value=70,
+                    step=10,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Outside Temperature (°C):"),
-                dcc.Input(id="outside_temp", type="number", value=6, step=1),
+                dcc.Input(
+                    id="outside_temp",
+                    type="number",
+                    value=6,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Outside Relative Humidity (%):"),
-                dcc.Input(id="outside_rh", type="number", value=80, step=1),
+                dcc.Input(
+                    id="outside_rh",
+                    type="number",
+                    value=80,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Inside Temperature (°C):"),
-                dcc.Input(id="inside_temp", type="number", value=21, step=1),
+                dcc.Input(
+                    id="inside_temp",
+                    type="number",
+                    value=21,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Initial Inside RH (%):"),
-                dcc.Input(id="initial_inside_rh", type="number", value=22, step=1),
+                dcc.Input(
+                    id="initial_inside_rh",
+                    type="number",
+                    value=22,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Initial Vaporization Rate (g/h):"),
                 dcc.Input(
-                    id="initial_vaporization_rate", type="number", value=250, step=10
+                    id="initial_vaporization_rate",
+                    type="number",
+                    value=250,
+                    step=10,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
                 ),
                 html.Label("Total Duration (hours):"),
-                dcc.Input(id="total_duration", type="number", value=24, step=1),
+                dcc.Input(
+                    id="total_duration",
+                    type="number",
+                    value=24,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
                 html.Label("Interval (minutes):"),
-                dcc.Input(id="interval_minutes", type="number", value=60, step=1),
+                dcc.Input(
+                    id="interval_minutes",
+                    type="number",
+                    value=60,
+                    step=1,
+                    debounce=INPUT_DEBOUNCE_SECONDS,
+                ),
             ],
             style={
                 "display": "grid",
@@ -50,10 +124,86 @@ app.layout = html.Div(
             },
         ),
         dcc.Graph(id="humidity_plot"),
+        html.H2("Vaporization Rate", style={"textAlign": "center"}),
+        dcc.Graph(id="vaporization_contour"),
+        dcc.Graph(id="isohume_plot"),
     ]
 )
 
 
+def relayout_range(relayout_data, axis, default):
+    """Read the zoomed range of `axis` from plotly relayout data, falling back to `default`."""
+    relayout_data = relayout_data or {}
+    if f"{axis}.range[0]" in relayout_data and f"{axis}.range[1]" in relayout_data:
+        return relayout_data[f"{axis}.range[0]"], relayout_data[f"{axis}.range[1]"]
+    if f"{axis}.range" in relayout_data:
+        return tuple(relayout_data[f"{axis}.range"])
+    return default
+
+
+@app.callback(
+    Output("vaporization_contour", "figure"),
+    Input("vaporization_contour", "relayoutData"),
+)
+def update_vaporization_contour(relayout_data):
+    # zooming only slices one of the cached grids, see lib.vaporization_grid
+    temperature_min, temperature_max = relayout_range(relayout_data, "xaxis", TEMPERATURE_RANGE)
+    humidity_min, humidity_max = relayout_range(relayout_data, "yaxis", RELATIVE_HUMIDITY_RANGE)
+    try:
+        window = grid_window(
+            CALIBRATED_K,
+            temperature_min=temperature_min,
+            temperature_max=temperature_max,
+            humidity_min=humidity_min,
+            humidity_max=humidity_max,
+        )
+    except ValueError:
+        # panned or zoomed entirely outside the grid, keep the current figure
+        raise PreventUpdate
+    fig = go.Figure(
+        go.Contour(
+            x=window["temperature"],
+            y=window["relative_humidity"],
+            z=window["vaporization_rate"],
+            ncontours=20,
+            colorscale="Viridis",
+            colorbar=dict(title="Vaporization Rate (g/h)"),
+        )
+    )
+    fig.update_layout(
+        title="Vaporization Rate vs. Temperature and Humidity",
+        xaxis_title="Temperature (°C)",
+        yaxis_title="Relative Humidity (%)",
+        # keep the user's zoom when the figure is replaced
+        uirevision="vaporization_contour",
+    )
+    return fig
+
+
+@app.callback(
+    Output("isohume_plot", "figure"),
+    Input("isohume_plot", "id"),
+)
+def update_isohume_plot(_):
+    lines = isohume_lines(CALIBRATED_K)
+    fig = go.Figure()
+    for relative_humidity, rates in zip(lines["relative_humidity"], lines["vaporization_rate"]):
+        fig.add_trace(
+            go.Scatter(
+                x=lines["temperature"],
+                y=rates,
+                mode="lines",
+                name=f"{relative_humidity:.0f} % RH",
+                line=dict(color="red", width=1),
+            )
+        )
+    fig.update_layout(
+        title="Vaporization Rates at Different Humidity Levels",
+        xaxis_title="Temperature (°C)",
+        yaxis_title="Vaporization Rate (g/h)",
+    )
+    return fig
+
 
 @app.callback(
     Output("humidity_plot", "figure"),
@@ -68,6 +218,8 @@ app.layout = html.Div(
         Input("total_duration", "value"),
         Input("interval_minutes", "value"),
     ],
+    background=True,
+    interval=BACKGROUND_POLL_INTERVAL_MS,
 )
 def update_plot(
     room_volume,
@@ -80,6 +232,19 @@ def update_plot(
     total_duration,
     interval_minutes,
 ):
+    if any(value is None for value in [
+        room_volume,
+        air_exchange_rate,
+        outside_temp,
+        outside_rh,
+        inside_temp,
+        initial_inside_rh,
+        initial_vaporization_rate,
+        total_duration,
+        interval_minutes,
+    ]):
+        # a field is empty or invalid while the user is still typing
+        raise PreventUpdate
     start = time.time()
     results = simulate_fixed_intervals(
         room_volume=room_volume,
@@ -1,5 +1,14 @@
+import math
+
 from flask import Flask, request, jsonify, render_template
-from lib import simulate_fixed_intervals
+from lib import SENSITIVITY_PARAMETERS, simulate_fixed_intervals
+from lib.vaporization_grid import (
+    CALIBRATED_K,
+    DEFAULT_POINTS_PER_AXIS,
+    RELATIVE_HUMIDITY_RANGE,
+    TEMPERATURE_RANGE,
+    grid_window,
+)
 
 app = Flask(__name__)
 
@@ -29,12 +38,15 @@ def simulate():
         initial_vaporization_rate = data.get('initial_vaporization_rate', 250)
         total_duration = data.get('total_duration', 24)
         interval_minutes = data.get('interval_minutes', 15)
+        sensitivities = data.get('sensitivities', False)
 
         # Validate inputs
         if not all(isinstance(value, (int, float)) for value in [room_volume, air_exchange_rate, outside_temp, inside_temp, initial_vaporization_rate, total_duration, interval_minutes]):
             raise ValueError("Numeric fields must be integers or floats.")
         if not all(0 <= value <= 100 for value in [outside_rh, initial_inside_rh]):
             raise ValueError("Relative humidity values must be between 0 and 100.")
+        if not isinstance(sensitivities, bool):
+            raise ValueError("sensitivities must be true or false.")
 
         # Run the simulation
         simulation_results = simulate_fixed_intervals(
@@ -46,7 +58,8 @@ def simulate():
             initial_inside_rh,
             initial_vaporization_rate,
             total_duration,
-            interval_minutes
+            interval_minutes,
+            sensitivities
         )
 
         # Unit annotations
@@ -59,6 +72,15 @@ def simulate():
             "humidity_balance": "g",
             "current_relative_humidity": "%"
         }
+        if sensitivities:
+            parameter_units = {
+                "air_exchange_rate": "m³/h",
+                "room_volume": "m³",
+                "outside_rh": "%",
+                "initial_vaporization_rate": "g/h",
+            }
+            for parameter in SENSITIVITY_PARAMETERS:
+                units[f"d_relative_humidity_d_{parameter}"] = f"%/({parameter_units[parameter]})"
 
         # Return results with units
         return jsonify({'columns': simulation_results, 'units': units}), 200
@@ -67,5 +89,53 @@ def simulate():
         return jsonify({'error': str(e)}), 400
 
 
+@app.route('/vaporization_grid', methods=['GET'])
+def vaporization_grid():
+    """
+    API endpoint serving a window of the precomputed vaporization rate grid.
+
+    The grid is computed once per `k` and resolution and cached, so requests
+    for zoomed windows are served without recomputation. Only grids of the
+    calibrated `k` are stored on disk.
+    """
+    try:
+        # Parse query parameters, invalid numbers are errors instead of falling back to the default
+        k = float(request.args.get('k', CALIBRATED_K))
+        temperature_min = float(request.args.get('temperature_min', TEMPERATURE_RANGE[0]))
+        temperature_max = float(request.args.get('temperature_max', TEMPERATURE_RANGE[1]))
+        humidity_min = float(request.args.get('humidity_min', RELATIVE_HUMIDITY_RANGE[0]))
+        humidity_max = float(request.args.get('humidity_max', RELATIVE_HUMIDITY_RANGE[1]))
+        points_per_axis = int(request.args.get('points_per_axis', DEFAULT_POINTS_PER_AXIS))
+        resolution = request.args.get('resolution')
+        if resolution is not None:
+            resolution = int(resolution)
+
+        if not math.isfinite(k) or k <= 0:
+            raise ValueError("k must be a positive finite number.")
+        if points_per_axis < 2:
+            raise ValueError("points_per_axis must be at least 2.")
+
+        window = grid_window(
+            k,
+            temperature_min=temperature_min,
+            temperature_max=temperature_max,
+            humidity_min=humidity_min,
+            humidity_max=humidity_max,
+            points_per_axis=points_per_axis,
+            resolution=resolution,
+        )
+
+        units = {
+            "temperature": "°C",
+            "relative_humidity": "%",
+            "vaporization_rate": "g/h",
+        }
+
+        return jsonify({'columns': window, 'units': units}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+
 if __name__ == '__main__':
     app.run(debug=True)
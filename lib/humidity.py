@@ -52,6 +52,14 @@ def transform_to_column_style(list_of_dicts):
     return column_style
 
 
+SENSITIVITY_PARAMETERS = [
+    'air_exchange_rate',
+    'room_volume',
+    'outside_rh',
+    'initial_vaporization_rate',
+]
+
+
 def simulate_fixed_intervals(
     room_volume,
     air_exchange_rate,
@@ -61,26 +69,73 @@ def simulate_fixed_intervals(
     initial_inside_rh,
     initial_vaporization_rate,
     total_duration,
-    interval_minutes
+    interval_minutes,
+    sensitivities=False
 ):
+    """
+    Simulate the indoor humidity in fixed time steps.
+
+    With `sensitivities=True` the derivatives of the current relative humidity
+    with respect to each of `SENSITIVITY_PARAMETERS` are propagated alongside
+    the state in the same pass (forward sensitivities of the time stepping) and
+    returned as extra `d_relative_humidity_d_<parameter>` columns.
+
+    Returns:
+    - A column-style dictionary of lists, see `transform_to_column_style`.
+    """
     interval_hours = interval_minutes / 60.0
     outside_abs_humidity = calculate_absolute_humidity(outside_temp, outside_rh)
     current_inside_abs_humidity = calculate_absolute_humidity(inside_temp, initial_inside_rh)
+    saturated_inside_abs_humidity = calculate_absolute_humidity(inside_temp, 100)
     results = []
     iterations = int(total_duration / interval_hours)
 
+    if sensitivities:
+        # Differentiating the update below gives every d(inside absolute humidity)/d(parameter)
+        # the same decay factor plus a parameter specific source term per step.
+        step_per_volume = interval_hours / room_volume
+        to_relative_humidity = 100 / saturated_inside_abs_humidity
+        decay_saturated = 1 - air_exchange_rate * step_per_volume
+        decay_unsaturated = decay_saturated - initial_vaporization_rate / saturated_inside_abs_humidity * step_per_volume
+        # absolute humidity is linear in the relative humidity
+        outside_rh_source = calculate_absolute_humidity(outside_temp, 1) * air_exchange_rate * step_per_volume
+        # zero at the start for all parameters, in the order of SENSITIVITY_PARAMETERS
+        air_exchange_rate_s = room_volume_s = outside_rh_s = initial_vaporization_rate_s = 0.0
+        sensitivity_columns = [[] for _ in SENSITIVITY_PARAMETERS]
+        (air_exchange_rate_column, room_volume_column,
+         outside_rh_column, initial_vaporization_rate_column) = sensitivity_columns
+
     for step in range(iterations):
         time = step * interval_hours
 
         # Calculate current relative humidity
         current_relative_humidity = (current_inside_abs_humidity /
-                                     calculate_absolute_humidity(inside_temp, 100)) * 100
+                                     saturated_inside_abs_humidity) * 100
 
         # Adjust vaporization rate based on current relative humidity
         vaporization_rate = calculate_vaporization_rate(initial_vaporization_rate, current_relative_humidity)
         # Calculate air exchange loss and net humidity change
         air_exchange_loss = (current_inside_abs_humidity - outside_abs_humidity) * air_exchange_rate * interval_hours
         net_humidity_change = (vaporization_rate * interval_hours) - air_exchange_loss
+
+        if sensitivities:
+            air_exchange_rate_column.append(air_exchange_rate_s * to_relative_humidity)
+            room_volume_column.append(room_volume_s * to_relative_humidity)
+            outside_rh_column.append(outside_rh_s * to_relative_humidity)
+            initial_vaporization_rate_column.append(initial_vaporization_rate_s * to_relative_humidity)
+            if current_relative_humidity >= 100:
+                # vaporization has stopped and no longer depends on the humidity
+                decay = decay_saturated
+                initial_vaporization_rate_source = 0
+            else:
+                decay = decay_unsaturated
+                initial_vaporization_rate_source = (1 - current_relative_humidity / 100) * step_per_volume
+            air_exchange_rate_s = (air_exchange_rate_s * decay
+                                   - (current_inside_abs_humidity - outside_abs_humidity) * step_per_volume)
+            room_volume_s = room_volume_s * decay - net_humidity_change / room_volume ** 2
+            outside_rh_s = outside_rh_s * decay + outside_rh_source
+            initial_vaporization_rate_s = initial_vaporization_rate_s * decay + initial_vaporization_rate_source
+
         current_inside_abs_humidity += net_humidity_change / room_volume
 
         results.append({
@@ -94,5 +149,9 @@ def simulate_fixed_intervals(
         })
 
     # Returning results as a list of dictionaries
-    return transform_to_column_style(results)
+    columns = transform_to_column_style(results)
+    if sensitivities and results:
+        for parameter, column in zip(SENSITIVITY_PARAMETERS, sensitivity_columns):
+            columns[f'd_relative_humidity_d_{parameter}'] = column
+    return columns
 
@@ -0,0 +1,249 @@
+"""Precomputed vaporization rate grids over temperature and relative humidity.
+
+The contour and isohume charts of `docs/experiment` evaluate the evaporation
+model on a temperature x relative humidity grid. Here the grids are computed
+once per calibration constant `k` and resolution and kept in memory. Grids of
+`CALIBRATED_K` are also stored as raw float32 files on disk. Zooming into a
+chart only slices the best fitting cached resolution, it never recomputes the
+grid.
+"""
+import array
+import functools
+import math
+import os
+
+TEMPERATURE_RANGE = (15, 35)  # [°C]
+RELATIVE_HUMIDITY_RANGE = (0, 100)  # [%]
+SURFACE_AREA = 1.0  # arbitrary units, absorbed by the calibration constant
+
+# points per axis. Every level doubles the intervals of the previous one, so
+# the coarser grids are exact subsets of the finer ones and every level has
+# grid lines at multiples of 10 % relative humidity.
+GRID_RESOLUTIONS = (51, 101, 201, 401, 801)
+DEFAULT_POINTS_PER_AXIS = 100
+GRID_CACHE_DIR = os.path.join("cache", "vaporization_grids")
+
+# kitchen scale measurement, see docs/experiment
+EXPERIMENTAL_DATA = {
+    "time": [0, 10, 20, 30, 40, 50, 60],  # minutes
+    "weight": [4834, 4798, 4768, 4740, 4710, 4677, 4648],  # g
+    "humidity": [31, 31, 31, 32, 32, 32, 33],  # %
+    "temperature": [23.2, 23.1, 23.0, 23.0, 23.0, 22.9, 22.9],  # °C
+}
+
+
+def saturation_vapor_pressure_kpa(temperature_celsius):
+    """Saturation vapor pressure in kPa (Clausius-Clapeyron approximation)."""
+    return 0.611 * math.exp((17.27 * temperature_celsius) / (temperature_celsius + 237.3))
+
+
+def vaporization_rate_g_per_h(temperature_celsius, relative_humidity, k, surface_area=SURFACE_AREA):
+    """
+    Calculate the vaporization rate of an open water surface.
+
+    Parameters:
+    - temperature_celsius: Air temperature in °C.
+    - relative_humidity: Relative humidity of the air in %.
+    - k: Calibrated mass transfer coefficient.
+    - surface_area: Surface area of the water.
+
+    Returns:
+    - Vaporization rate in g/h.
+    """
+    saturated_pressure = saturation_vapor_pressure_kpa(temperature_celsius)
+    partial_pressure = saturated_pressure * (relative_humidity / 100)
+    return k * surface_area * (saturated_pressure - partial_pressure) * 3600  # g/s to g/h
+
+
+def calibrate_k(experimental_data=EXPERIMENTAL_DATA, surface_area=SURFACE_AREA):
+    """
+    Calibrate the mass transfer coefficient from weight measurements of an evaporating water surface.
+
+    Parameters:
+    - experimental_data: Dictionary of `time` (minutes), `weight` (g), `humidity` (%) and `temperature` (°C) lists.
+    - surface_area: Surface area of the water.
+
+    Returns:
+    - The mass transfer coefficient `k`.
+    """
+    times = experimental_data["time"]
+    weights = experimental_data["weight"]
+    observed_rates = [
+        (weights[i] - weights[i + 1]) / (times[i + 1] - times[i]) * 60  # g/h
+        for i in range(len(times) - 1)
+    ]
+    avg_temperature = sum(experimental_data["temperature"]) / len(experimental_data["temperature"])
+    avg_humidity = sum(experimental_data["humidity"]) / len(experimental_data["humidity"])
+    avg_observed_rate = sum(observed_rates) / len(observed_rates)
+    return avg_observed_rate / vaporization_rate_g_per_h(avg_temperature, avg_humidity, 1.0, surface_area)
+
+
+CALIBRATED_K = calibrate_k()
+
+
+def grid_axis(value_range, resolution):
+    start, stop = value_range
+    step = (stop - start) / (resolution - 1)
+    return [start + i * step for i in range(resolution)]
+
+
+def compute_grid(k, resolution):
+    """
+    Evaluate the vaporization rate on a resolution x resolution grid.
+
+    Parameters:
+    - k: Calibrated mass transfer coefficient.
+    - resolution: Number of points per axis.
+
+    Returns:
+    - A float32 array of rates in g/h, row major with one row per relative humidity.
+    """
+    # the model factors into a temperature and a humidity part
+    saturated_rates = [
+        vaporization_rate_g_per_h(temperature, 0, k) for temperature in grid_axis(TEMPERATURE_RANGE, resolution)
+    ]
+    grid = array.array("f")
+    for relative_humidity in grid_axis(RELATIVE_HUMIDITY_RANGE, resolution):
+        dryness = 1 - relative_humidity / 100
+        grid.extend(rate * dryness for rate in saturated_rates)
+    return grid
+
+
+def grid_cache_path(k, resolution, cache_dir=GRID_CACHE_DIR):
+    # repr round-trips, so different values of k never share a file
+    return os.path.join(cache_dir, f"vaporization_rate_k{k!r}_r{resolution}.f32")
+
+
+@functools.lru_cache(maxsize=16)
+def load_grid(k, resolution, cache_dir=GRID_CACHE_DIR):
+    """
+    Return the grid for `k` and `resolution`, computing it on the first request only.
+
+    Only grids of `CALIBRATED_K` are written to disk. Other values of `k`, for
+    example from a query string, are kept in the bounded in-memory cache so
+    they cannot fill the disk.
+
+    Parameters:
+    - k: Calibrated mass transfer coefficient.
+    - resolution: Number of points per axis.
+    - cache_dir: Directory of the on-disk grid cache.
+
+    Returns:
+    - A float32 array as returned by `compute_grid`.
+    """
+    if k != CALIBRATED_K:
+        return compute_grid(k, resolution)
+
+    path = grid_cache_path(k, resolution, cache_dir)
+    grid = array.array("f")
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            grid.frombytes(file.read())
+        if len(grid) == resolution * resolution:
+            return grid
+
+    grid = compute_grid(k, resolution)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write under a unique name first, concurrent workers may compute the same grid
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        grid.tofile(file)
+    os.replace(temporary_path, path)
+    return grid
+
+
+def choose_resolution(temperature_span, humidity_span, points_per_axis):
+    """Pick the coarsest cached resolution that still shows `points_per_axis` points in the window."""
+    full_temperature_span = TEMPERATURE_RANGE[1] - TEMPERATURE_RANGE[0]
+    full_humidity_span = RELATIVE_HUMIDITY_RANGE[1] - RELATIVE_HUMIDITY_RANGE[0]
+    for resolution in GRID_RESOLUTIONS:
+        intervals = resolution - 1
+        if (temperature_span / full_temperature_span * intervals >= points_per_axis - 1
+                and humidity_span / full_humidity_span * intervals >= points_per_axis - 1):
+            return resolution
+    return GRID_RESOLUTIONS[-1]
+
+
+def window_indices(value_range, resolution, low, high):
+    start, stop = value_range
+    if high < start or low > stop:
+        raise ValueError(f"Window {low} to {high} lies outside the grid range {start} to {stop}.")
+    step = (stop - start) / (resolution - 1)
+    first = min(max(0, math.floor((low - start) / step)), resolution - 1)
+    last = max(min(resolution - 1, math.ceil((high - start) / step)), first)
+    return first, last
+
+
+def grid_window(
+    k=CALIBRATED_K,
+    temperature_min=TEMPERATURE_RANGE[0],
+    temperature_max=TEMPERATURE_RANGE[1],
+    humidity_min=RELATIVE_HUMIDITY_RANGE[0],
+    humidity_max=RELATIVE_HUMIDITY_RANGE[1],
+    points_per_axis=DEFAULT_POINTS_PER_AXIS,
+    resolution=None,
+):
+    """
+    Cut a window out of a cached vaporization rate grid.
+
+    Parameters:
+    - k: Calibrated mass transfer coefficient.
+    - temperature_min, temperature_max: Temperature window in °C.
+    - humidity_min, humidity_max: Relative humidity window in %.
+    - points_per_axis: Desired number of points per axis inside the window.
+    - resolution: Fixed grid resolution. Chosen from `GRID_RESOLUTIONS` if omitted.
+
+    Returns:
+    - A column style dictionary with the `temperature` and `relative_humidity` axes,
+      the `vaporization_rate` rows (one per relative humidity) and the `resolution` used.
+    """
+    if not math.isfinite(k) or k <= 0:
+        raise ValueError("k must be a positive finite number.")
+    if not all(math.isfinite(value) for value in [temperature_min, temperature_max, humidity_min, humidity_max]):
+        raise ValueError("Window bounds must be finite numbers.")
+    temperature_min, temperature_max = sorted((temperature_min, temperature_max))
+    humidity_min, humidity_max = sorted((humidity_min, humidity_max))
+    if resolution is None:
+        resolution = choose_resolution(
+            temperature_max - temperature_min, humidity_max - humidity_min, points_per_axis
+        )
+    if resolution not in GRID_RESOLUTIONS:
+        raise ValueError(f"Resolution must be one of {', '.join(map(str, GRID_RESOLUTIONS))}.")
+
+    grid = load_grid(k, resolution)
+    first_column, last_column = window_indices(TEMPERATURE_RANGE, resolution, temperature_min, temperature_max)
+    first_row, last_row = window_indices(RELATIVE_HUMIDITY_RANGE, resolution, humidity_min, humidity_max)
+    return {
+        "temperature": grid_axis(TEMPERATURE_RANGE, resolution)[first_column:last_column + 1],
+        "relative_humidity": grid_axis(RELATIVE_HUMIDITY_RANGE, resolution)[first_row:last_row + 1],
+        "vaporization_rate": [
+            grid[row * resolution + first_column:row * resolution + last_column + 1].tolist()
+            for row in range(first_row, last_row + 1)
+        ],
+        "resolution": resolution,
+    }
+
+
+def isohume_lines(k=CALIBRATED_K, humidity_step=10, resolution=GRID_RESOLUTIONS[1]):
+    """
+    Vaporization rate over temperature at constant relative humidity, taken from a cached grid.
+
+    Parameters:
+    - k: Calibrated mass transfer coefficient.
+    - humidity_step: Distance between the isohumes in % relative humidity.
+    - resolution: Grid resolution to take the lines from.
+
+    Returns:
+    - A dictionary like `grid_window` with only the rows at multiples of `humidity_step`.
+    """
+    window = grid_window(k, resolution=resolution)
+    rows = [
+        row for row, relative_humidity in enumerate(window["relative_humidity"])
+        if math.isclose(relative_humidity / humidity_step, round(relative_humidity / humidity_step))
+    ]
+    return {
+        "temperature": window["temperature"],
+        "relative_humidity": [window["relative_humidity"][row] for row in rows],
+        "vaporization_rate": [window["vaporization_rate"][row] for row in rows],
+        "resolution": resolution,
+    }
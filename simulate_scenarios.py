@@ -0,0 +1,412 @@
+"""Run a file of scenarios through `simulate_fixed_intervals` without a UI.
+
+Scenarios are read from a CSV file (one column per parameter) or a JSON lines
+file (one object per line). They are simulated in chunks across all cores and
+every chunk is written as its own zstd compressed parquet file, so memory stays
+bounded no matter how large the scenario file is. Finished chunks are skipped
+when the command is run again, which makes an interrupted run resumable. The
+settings of the first run are kept in `_manifest.json` of the output directory
+and a run with different settings is refused.
+
+Every row is validated before it is simulated. An invalid row stops the run
+with its line number; the chunks finished until then are kept, so fix the row
+and run the same command again.
+
+Usage:
+    python simulate_scenarios.py scenarios.csv results/
+"""
+import argparse
+import bisect
+import csv
+import json
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lib import MAGNUS_B, SENSITIVITY_PARAMETERS, simulate_fixed_intervals
+
+SCENARIO_PARAMETERS = [
+    'room_volume',
+    'air_exchange_rate',
+    'outside_temp',
+    'outside_rh',
+    'inside_temp',
+    'initial_inside_rh',
+    'initial_vaporization_rate',
+    'total_duration',
+    'interval_minutes',
+]
+
+RESULT_SCHEMA = pa.schema([
+    ('scenario', pa.int64()),
+    ('time', pa.float64()),
+    ('current_absolute_humidity', pa.float64()),
+    ('net_humidity_change', pa.float64()),
+    ('air_exchange_loss', pa.float64()),
+    ('humidity_added', pa.float64()),
+    ('humidity_balance', pa.float64()),
+    ('current_relative_humidity', pa.float64()),
+])
+
+SENSITIVITY_SCHEMA = pa.schema([
+    (f'd_relative_humidity_d_{parameter}', pa.float64()) for parameter in SENSITIVITY_PARAMETERS
+])
+
+DEFAULT_CHUNK_SIZE = 1000
+# a leading underscore keeps the manifest out of the parquet dataset
+MANIFEST_FILE_NAME = '_manifest.json'
+
+
+def parse_scenario(record, line_number):
+    """
+    Convert a raw record of the scenario file into keyword arguments of `simulate_fixed_intervals`.
+
+    Parameters:
+    - record: Mapping of parameter name to value (strings for CSV input).
+    - line_number: Line of the scenario file the record was read from, used in error messages.
+
+    Returns:
+    - A dictionary with all simulation parameters as floats.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Line {line_number}: a scenario must be an object of parameters.")
+    missing = [name for name in SCENARIO_PARAMETERS if record.get(name) in (None, '')]
+    if missing:
+        raise ValueError(f"Line {line_number}: missing parameters {', '.join(missing)}.")
+    try:
+        scenario = {name: float(record[name]) for name in SCENARIO_PARAMETERS}
+    except (TypeError, ValueError):
+        raise ValueError(f"Line {line_number}: numeric fields must be integers or floats.")
+
+    # Validate inputs
+    if not all(math.isfinite(value) for value in scenario.values()):
+        raise ValueError(f"Line {line_number}: numeric fields must be finite.")
+    if scenario['room_volume'] <= 0 or scenario['interval_minutes'] <= 0:
+        raise ValueError(f"Line {line_number}: room_volume and interval_minutes must be positive.")
+    if scenario['total_duration'] < 0:
+        raise ValueError(f"Line {line_number}: total_duration must not be negative.")
+    if not all(0 <= scenario[name] <= 100 for name in ['outside_rh', 'initial_inside_rh']):
+        raise ValueError(f"Line {line_number}: relative humidity values must be between 0 and 100.")
+    # the Magnus formula has a pole at -MAGNUS_B, which is above absolute zero
+    if not all(scenario[name] > -MAGNUS_B for name in ['outside_temp', 'inside_temp']):
+        raise ValueError(f"Line {line_number}: temperatures must be above {-MAGNUS_B} °C.")
+    return scenario
+
+
+def read_scenarios(path):
+    """
+    Lazily read scenarios from a CSV or JSON lines file.
+
+    Parameters:
+    - path: Path to a `.csv` file or a JSON lines file (`.jsonl`, `.ndjson`, `.json`).
+
+    Returns:
+    - An iterator of parameter dictionaries, in file order.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as file:
+            # line 1 holds the header
+            for line_number, row in enumerate(csv.DictReader(file), start=2):
+                yield parse_scenario(row, line_number)
+    else:
+        with open(path) as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Line {line_number}: invalid JSON ({e.msg}).")
+                yield parse_scenario(record, line_number)
+
+
+def chunk_scenarios(scenarios, chunk_size):
+    """
+    Group scenarios into consecutive chunks.
+
+    Parameters:
+    - scenarios: Iterator of parameter dictionaries.
+    - chunk_size: Maximum number of scenarios per chunk.
+
+    Returns:
+    - An iterator of (index of the first scenario, list of scenarios) tuples.
+    """
+    start = 0
+    chunk = []
+    for scenario in scenarios:
+        chunk.append(scenario)
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def part_file_name(start, stop):
+    return f'part-{start:012d}-{stop:012d}.parquet'
+
+
+def finished_part_ranges(output_dir):
+    """
+    Collect the scenario ranges of the part files already in `output_dir`.
+
+    Returns:
+    - A sorted list of (start, stop) tuples.
+
+    Raises:
+    - ValueError: If two part files cover the same scenarios.
+    """
+    ranges = []
+    for name in os.listdir(output_dir):
+        if name.startswith('part-') and name.endswith('.parquet'):
+            start, stop = name[len('part-'):-len('.parquet')].split('-')
+            ranges.append((int(start), int(stop)))
+    ranges.sort()
+    for previous, current in zip(ranges, ranges[1:]):
+        if current[0] < previous[1]:
+            raise ValueError(
+                f"{part_file_name(*previous)} and {part_file_name(*current)} in {output_dir} "
+                f"cover the same scenarios. Delete one of them or use a new output directory."
+            )
+    return ranges
+
+
+def overlapping_part(finished_ranges, start, stop):
+    """Return the finished range that overlaps but differs from scenarios `start` to `stop`, if any."""
+    index = bisect.bisect_left(finished_ranges, (start, stop))
+    for candidate in finished_ranges[max(index - 1, 0):index + 1]:
+        if candidate != (start, stop) and candidate[0] < stop and start < candidate[1]:
+            return candidate
+    return None
+
+
+def check_manifest(output_dir, settings):
+    """
+    Record the run settings in `output_dir`, or compare them with the recorded ones when resuming.
+
+    Parameters:
+    - output_dir: Output directory of the run.
+    - settings: Dictionary of settings that must not change between runs.
+
+    Raises:
+    - ValueError: If the output directory was written with different settings.
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        with open(path, 'w') as file:
+            json.dump(settings, file, indent=2)
+        return
+    with open(path) as file:
+        recorded = json.load(file)
+    changed = [
+        f'{key}={recorded.get(key)!r} (this run: {value!r})'
+        for key, value in settings.items() if recorded.get(key) != value
+    ]
+    if changed:
+        raise ValueError(
+            f"{output_dir} was written with {', '.join(changed)}. "
+            f"Run with the recorded settings to resume or use a new output directory."
+        )
+
+
+def result_schema(sensitivities):
+    if sensitivities:
+        return pa.unify_schemas([RESULT_SCHEMA, SENSITIVITY_SCHEMA])
+    return RESULT_SCHEMA
+
+
+def run_chunk(output_dir, start, scenarios, sensitivities=False):
+    """
+    Simulate a chunk of scenarios and write the results to a single parquet file.
+
+    The file is written under a temporary name and renamed once complete, so a
+    part file that exists is always a finished one.
+
+    Parameters:
+    - output_dir: Directory the part file is written to.
+    - start: Index of the first scenario in the chunk, used as scenario id offset.
+    - scenarios: List of parameter dictionaries.
+    - sensitivities: Also write the d(RH)/d(parameter) columns of `simulate_fixed_intervals`.
+
+    Returns:
+    - Number of simulated scenarios.
+    """
+    schema = result_schema(sensitivities)
+    columns = {name: [] for name in schema.names}
+    for offset, scenario in enumerate(scenarios):
+        try:
+            results = simulate_fixed_intervals(**scenario, sensitivities=sensitivities)
+        except Exception as e:
+            raise ValueError(f"Scenario {start + offset}: simulation failed ({type(e).__name__}: {e}).")
+        steps = len(results.get('time', []))
+        columns['scenario'].extend([start + offset] * steps)
+        for name in schema.names[1:]:
+            columns[name].extend(results.get(name, []))
+
+    name = part_file_name(start, start + len(scenarios))
+    path = os.path.join(output_dir, name)
+    # hidden files are ignored when the directory is read as a parquet dataset
+    temporary_path = os.path.join(output_dir, f'.{name}.tmp')
+    pq.write_table(pa.table(columns, schema=schema), temporary_path, compression='zstd')
+    os.replace(temporary_path, path)
+    return len(scenarios)
+
+
+def ignore_interrupts():
+    """Worker initializer: Ctrl-C is handled by the main process, which lets the chunks in flight finish."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def positive_int(value):
+    """argparse type for options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {number}')
+    return number
+
+
+def collect_finished(done, pending_ranges):
+    """
+    Return the number of scenarios of finished chunks, reporting failed chunks with their scenario range.
+
+    Parameters:
+    - done: Finished futures of `run_chunk`.
+    - pending_ranges: Dictionary of future to its (start, stop) scenario range; finished futures are removed.
+
+    Returns:
+    - Number of simulated scenarios.
+    """
+    simulated = 0
+    for future in done:
+        start, stop = pending_ranges.pop(future)
+        try:
+            simulated += future.result()
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Scenarios {start} to {stop}: chunk failed ({type(e).__name__}: {e}).")
+    return simulated
+
+
+def report_progress(simulated, skipped, started_at):
+    rate = simulated / max(time.time() - started_at, 1e-9)
+    print(
+        f'\r{simulated} scenarios simulated, {skipped} already done ({rate:.0f} scenarios/s)',
+        end='',
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def run_scenario_file(scenario_path, output_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, sensitivities=False):
+    """
+    Simulate every scenario of a scenario file in parallel and stream the results to disk.
+
+    At most one chunk per worker is submitted at any time, so neither the
+    scenario file nor the results are ever held in memory as a whole. It also
+    means no chunk waits in the executor's queue, so Ctrl-C returns as soon as
+    the chunks in flight are written.
+
+    Parameters:
+    - scenario_path: Path to the CSV or JSON lines scenario file.
+    - output_dir: Directory for the parquet part files. Created if missing.
+    - workers: Number of worker processes. Defaults to the number of cores.
+    - chunk_size: Number of scenarios per part file.
+    - sensitivities: Also write the d(RH)/d(parameter) columns.
+
+    The scenario file, the chunk size and `sensitivities` must be the same when resuming a run.
+
+    Returns:
+    - A (simulated, skipped) tuple with the number of scenarios of each kind.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}.")
+    os.makedirs(output_dir, exist_ok=True)
+    check_manifest(output_dir, {
+        'scenario_file': os.path.abspath(scenario_path),
+        'chunk_size': chunk_size,
+        'sensitivities': sensitivities,
+    })
+    finished_ranges = finished_part_ranges(output_dir)
+    finished = set(finished_ranges)
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers
+    simulated = 0
+    skipped = 0
+    started_at = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=ignore_interrupts) as executor:
+        pending_ranges = {}
+        try:
+            for start, scenarios in chunk_scenarios(read_scenarios(scenario_path), chunk_size):
+                stop = start + len(scenarios)
+                if (start, stop) in finished:
+                    skipped += len(scenarios)
+                    continue
+                overlap = overlapping_part(finished_ranges, start, stop)
+                if overlap:
+                    raise ValueError(
+                        f"{part_file_name(*overlap)} overlaps scenarios {start} to {stop} of this run, "
+                        f"the scenario file changed since it was written. "
+                        f"Delete the part file to simulate these scenarios again or use a new output directory."
+                    )
+                if len(pending_ranges) >= max_pending:
+                    done, _ = wait(pending_ranges, return_when=FIRST_COMPLETED)
+                    simulated += collect_finished(done, pending_ranges)
+                    report_progress(simulated, skipped, started_at)
+                future = executor.submit(run_chunk, output_dir, start, scenarios, sensitivities)
+                pending_ranges[future] = (start, stop)
+
+            while pending_ranges:
+                done, _ = wait(pending_ranges, return_when=FIRST_COMPLETED)
+                simulated += collect_finished(done, pending_ranges)
+                report_progress(simulated, skipped, started_at)
+        except BaseException:
+            # finish and write the chunks in flight but drop the queued ones,
+            # they are picked up again when the run is resumed
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    report_progress(simulated, skipped, started_at)
+    print(file=sys.stderr)
+    return simulated, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenario_file', help='CSV or JSON lines file with one scenario per row')
+    parser.add_argument('output_dir', help='directory for the compressed parquet result files')
+    parser.add_argument('--workers', type=positive_int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument(
+        '--chunk-size',
+        type=positive_int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f'scenarios per result file, keep it unchanged when resuming (default: {DEFAULT_CHUNK_SIZE})',
+    )
+    parser.add_argument(
+        '--sensitivities',
+        action='store_true',
+        help='also write d(relative humidity)/d(parameter) columns, computed in the same pass',
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        run_scenario_file(args.scenario_file, args.output_dir, args.workers, args.chunk_size, args.sensitivities)
+    except KeyboardInterrupt:
+        print('\nInterrupted. Chunks in flight were written, run the same command again to resume.', file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f'\n{e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())